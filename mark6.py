@@ -1,32 +1,70 @@
-from flask import Flask, render_template_string, jsonify, request, make_response
+from flask import Flask, render_template_string, jsonify, request, make_response, Response, g
 import ping3
 import threading
 import time
 from datetime import datetime
 import hashlib
 import json
+import math
 import os
+import sys
+import csv
+import io
+import zlib
+from array import array
+from collections import deque, Counter
 
 app = Flask(__name__)
 
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "pass")
 PASSWORD_HASH = hashlib.sha256(ADMIN_PASSWORD.encode()).hexdigest()
 
-IP_FILE = "monitored_ips.json"
+# Kept in its own directory so docker-compose can bind-mount the directory:
+# a single-file mount pins the old inode and never sees rename-based rewrites
+IP_FILE = os.getenv("IP_FILE", os.path.join("config", "monitored_ips.json"))
 ip_status = {}
 
+# Number of raw samples kept per host for /export
+HISTORY_SIZE = int(os.getenv("HISTORY_SIZE", "1000"))
+ip_history = {}
+
+# Uptime rollups: granularity in seconds -> number of buckets kept. Minute
+# buckets only serve the recent edge of a window, older edges use hours.
+ROLLUP_RETENTION = {
+    60: int(os.getenv("ROLLUP_MINUTES", str(3 * 60))),
+    3600: int(os.getenv("ROLLUP_HOURS", str(35 * 24))),
+    86400: int(os.getenv("ROLLUP_DAYS", "400")),
+}
+# ip -> granularity -> RollupRing
+ip_rollups = {}
+
+# Probe pacing: packets per second, 0 disables the limit
+SWEEP_INTERVAL = float(os.getenv("SWEEP_INTERVAL", "5"))
+PROBE_RATE_LIMIT = float(os.getenv("PROBE_RATE_LIMIT", "50"))
+# Comma separated "cidr=pps" pairs, e.g. "10.0.0.0/8=20,192.168.1.0/24=5"
+SUBNET_RATE_LIMITS = os.getenv("SUBNET_RATE_LIMITS", "")
+# Longest a probe waits for a token before it is dropped by the limiter
+PROBE_MAX_WAIT = float(os.getenv("PROBE_MAX_WAIT", "2"))
+
+
+def read_ip_file():
+    """Parse IP_FILE into an {ip: name} dict, raising on bad content"""
+    with open(IP_FILE, 'r') as f:
+        data = json.load(f)
+    # Check if the loaded data is a list (old format)
+    if isinstance(data, list):
+        # Convert list to dictionary with default names
+        return {ip: f"Server {i+1}" for i, ip in enumerate(data)}
+    if not isinstance(data, dict):
+        raise ValueError("expected a JSON object or list")
+    return data
+
 
 def load_ip_addresses():
     """Load IP addresses and names from file"""
     try:
         if os.path.exists(IP_FILE):
-            with open(IP_FILE, 'r') as f:
-                data = json.load(f)
-                # Check if the loaded data is a list (old format)
-                if isinstance(data, list):
-                    # Convert list to dictionary with default names
-                    return {ip: f"Server {i+1}" for i, ip in enumerate(data)}
-                return data
+            return read_ip_file()
     except Exception as e:
         print(f"Error loading IP addresses: {e}")
     # Default IPs with names
@@ -57,6 +95,118 @@ def validate_ip(ip):
 
 # Load initial IP addresses
 ip_addresses = load_ip_addresses()
+ip_addresses_lock = threading.Lock()
+# Replaced whenever ip_addresses changes so compact /status clients can cache
+# names; random so a cached version never matches after a restart
+names_version = os.urandom(8).hex()
+
+# Seconds between stat checks of IP_FILE when inotify is unavailable or quiet
+WATCH_INTERVAL = float(os.getenv("WATCH_INTERVAL", "2"))
+
+
+def bump_names_version():
+    global names_version
+    names_version = os.urandom(8).hex()
+
+
+def forget_ip(ip):
+    """Drop all in-memory state of a host that is no longer monitored"""
+    ip_status.pop(ip, None)
+    ip_history.pop(ip, None)
+    ip_rollups.pop(ip, None)
+
+
+def apply_ip_changes(new_ips):
+    """Apply only the added, removed and renamed entries to ip_addresses.
+
+    The caller must hold ip_addresses_lock.
+    """
+    added = {ip: name for ip, name in new_ips.items()
+             if ip not in ip_addresses and validate_ip(ip)}
+    removed = [ip for ip in ip_addresses if ip not in new_ips]
+    renamed = {ip: name for ip, name in new_ips.items()
+               if ip in ip_addresses and ip_addresses[ip] != name}
+    for ip in removed:
+        del ip_addresses[ip]
+        forget_ip(ip)
+    ip_addresses.update(added)
+    ip_addresses.update(renamed)
+    if added or removed or renamed:
+        bump_names_version()
+    return added, removed, renamed
+
+
+def reload_ip_file():
+    """Re-read IP_FILE and apply the diff to the running monitor"""
+    # Read under the lock so a concurrent /add-ip or /remove-ip save can't be
+    # undone by applying an older snapshot of the file
+    with ip_addresses_lock:
+        added, removed, renamed = apply_ip_changes(read_ip_file())
+    if added or removed or renamed:
+        print(f"Reloaded {IP_FILE}: {len(added)} added, "
+              f"{len(removed)} removed, {len(renamed)} renamed")
+    return added, removed, renamed
+
+
+def file_signature(path):
+    try:
+        st = os.stat(path)
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+    except OSError:
+        return None
+
+
+def open_inotify(paths):
+    """Return an inotify fd watching paths, or None if inotify is unavailable"""
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        # IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        mask = 0x002 | 0x004 | 0x008 | 0x080 | 0x100
+        watched = [libc.inotify_add_watch(fd, path.encode(), mask) for path in paths]
+        if max(watched) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except Exception as e:
+        print(f"inotify unavailable, polling {IP_FILE}: {e}")
+        return None
+
+
+def watch_ip_file():
+    """Fungsi background untuk reload IP_FILE saat berubah"""
+    import select
+    path = os.path.abspath(IP_FILE)
+    # Watch the directory for atomic replaces and the file for bind-mount writes
+    fd = open_inotify([os.path.dirname(path), path])
+    signature = file_signature(path)
+    while True:
+        if fd is not None:
+            ready, _, _ = select.select([fd], [], [], WATCH_INTERVAL)
+            if ready:
+                # Let the writer finish, then drain the queued events
+                time.sleep(0.2)
+                try:
+                    while os.read(fd, 4096):
+                        pass
+                except BlockingIOError:
+                    pass
+        else:
+            time.sleep(WATCH_INTERVAL)
+
+        # The stat check also catches events inotify missed
+        current = file_signature(path)
+        if current is None or current == signature:
+            continue
+        signature = current
+        try:
+            reload_ip_file()
+        except Exception as e:
+            print(f"Error reloading IP addresses: {e}")
 
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -533,10 +683,56 @@ HTML_TEMPLATE = """
          // Add click event listener to close popup when clicking overlay
         document.getElementById('notification-overlay').addEventListener('click', closeNotification);
 
+        // Compact /status: names are cached and refetched only when they change
+        let namesVersion = null;
+        let cachedIps = [];
+        let cachedNames = {};
+
+        // Render in the server's timezone, like the legacy string timestamps
+        function formatTimestamp(epoch, tzOffset) {
+            const d = new Date((epoch + tzOffset) * 1000);
+            const pad = n => String(n).padStart(2, '0');
+            return `${d.getUTCFullYear()}-${pad(d.getUTCMonth() + 1)}-${pad(d.getUTCDate())} ` +
+                `${pad(d.getUTCHours())}:${pad(d.getUTCMinutes())}:${pad(d.getUTCSeconds())}`;
+        }
+
+        function expandColumnarStatus(compact) {
+            if (compact.ips) {
+                cachedIps = compact.ips;
+                cachedNames = {};
+                compact.ips.forEach((ip, i) => { cachedNames[ip] = compact.names[i]; });
+                namesVersion = compact.names_version;
+            } else if (compact.online.length !== cachedIps.length) {
+                // Cached names no longer line up with the columns
+                namesVersion = null;
+                return null;
+            }
+            const status = {};
+            cachedIps.forEach((ip, i) => {
+                if (compact.online[i] === null || compact.online[i] === undefined) {
+                    return;
+                }
+                status[ip] = {
+                    online: compact.online[i] === 1,
+                    response_time: compact.rtt[i] !== null ? compact.rtt[i].toFixed(2) : 'N/A',
+                    last_check: compact.last_check[i] !== null ? formatTimestamp(compact.base + compact.last_check[i], compact.tz_offset) : null,
+                    last_online: compact.last_online[i] !== null ? formatTimestamp(compact.base + compact.last_online[i], compact.tz_offset) : null
+                };
+            });
+            return { status: status, names: cachedNames };
+        }
+
         function updateStatus() {
-            fetch('/status')
+            const query = namesVersion === null ? '' : `&names_version=${encodeURIComponent(namesVersion)}`;
+            fetch(`/status?format=columnar${query}`)
                 .then(response => response.json())
+                .then(expandColumnarStatus)
                 .then(data => {
+                    if (data === null) {
+                        // Names were stale, fetch them again right away
+                        updateStatus();
+                        return;
+                    }
                     updateNotificationBanner(data);
                     
                     const container = document.getElementById('status-container');
@@ -661,37 +857,407 @@ HTML_TEMPLATE = """
 """
 
 
-def check_ip(ip):
-    """Fungsi untuk mengecek status IP"""
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate` tokens per second"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst if burst else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, max_wait):
+        """Take one token, sleeping up to max_wait seconds. Returns False on timeout."""
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity,
+                                  self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def release(self):
+        """Give back a token taken for a probe that was not sent"""
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+
+def parse_subnet_limits(spec):
+    """Parse "cidr=pps" pairs into (network, TokenBucket), most specific first"""
+    import ipaddress
+    limits = []
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        try:
+            cidr, rate = item.split('=')
+            rate = float(rate)
+            if rate > 0:
+                limits.append((ipaddress.ip_network(cidr.strip(), strict=False),
+                               TokenBucket(rate)))
+        except ValueError as e:
+            print(f"Error parsing subnet rate limit '{item}': {e}")
+    limits.sort(key=lambda limit: limit[0].prefixlen, reverse=True)
+    return limits
+
+
+global_bucket = TokenBucket(PROBE_RATE_LIMIT) if PROBE_RATE_LIMIT > 0 else None
+subnet_buckets = parse_subnet_limits(SUBNET_RATE_LIMITS)
+
+probe_stats = {'sent': 0, 'timeouts': 0, 'errors': 0, 'rate_limited': 0}
+probe_stats_lock = threading.Lock()
+
+
+def count_probe(key):
+    with probe_stats_lock:
+        probe_stats[key] += 1
+
+
+def record_sample(ip, is_online, response_time):
+    """Append a (timestamp, online, rtt ms) sample to the host history"""
+    with ip_addresses_lock:
+        # The probe may outlast a removal; don't resurrect a forgotten host
+        if ip not in ip_addresses:
+            return
+        history = ip_history.get(ip)
+        if history is None:
+            history = ip_history.setdefault(ip, deque(maxlen=HISTORY_SIZE))
+        now = time.time()
+        history.append((now, is_online, response_time if is_online else None))
+        update_rollups(ip, now, is_online, response_time)
+
+
+class RollupRing:
+    """Fixed-size ring of buckets for one granularity, stored as flat arrays.
+
+    Slot i holds the bucket starting at starts[i]; a slot is reset when a
+    newer bucket maps onto it, which is how old buckets expire.
+    """
+
+    __slots__ = ('granularity', 'keep', 'starts', 'up', 'down',
+                 'rtt_sum', 'rtt_min', 'rtt_max')
+
+    def __init__(self, granularity, keep):
+        self.granularity = granularity
+        self.keep = keep
+        self.starts = array('q', [-1]) * keep
+        self.up = array('L', [0]) * keep
+        self.down = array('L', [0]) * keep
+        self.rtt_sum = array('d', [0.0]) * keep
+        self.rtt_min = array('d', [math.inf]) * keep
+        self.rtt_max = array('d', [-math.inf]) * keep
+
+    def add(self, ts, is_online, response_time):
+        start = int(ts // self.granularity) * self.granularity
+        i = start // self.granularity % self.keep
+        if self.starts[i] != start:
+            self.starts[i] = start
+            self.up[i] = self.down[i] = 0
+            self.rtt_sum[i] = 0.0
+            self.rtt_min[i] = math.inf
+            self.rtt_max[i] = -math.inf
+        if is_online:
+            self.up[i] += 1
+            self.rtt_sum[i] += response_time
+            self.rtt_min[i] = min(self.rtt_min[i], response_time)
+            self.rtt_max[i] = max(self.rtt_max[i], response_time)
+        else:
+            self.down[i] += 1
+
+    def get(self, start):
+        """Return (up, down, rtt_sum, rtt_min, rtt_max) for a bucket, or None"""
+        i = start // self.granularity % self.keep
+        if self.starts[i] != start:
+            return None
+        return self.up[i], self.down[i], self.rtt_sum[i], self.rtt_min[i], self.rtt_max[i]
+
+
+def update_rollups(ip, ts, is_online, response_time):
+    """Fold one sample into the minute, hour and day buckets of a host"""
+    rollups = ip_rollups.get(ip)
+    if rollups is None:
+        rollups = ip_rollups.setdefault(
+            ip, {g: RollupRing(g, keep) for g, keep in ROLLUP_RETENTION.items()})
+    for ring in rollups.values():
+        ring.add(ts, is_online, response_time)
+
+
+def clamp_uptime_window(start, end, now):
+    """Limit [start, end) to the retained day buckets and the past"""
+    coarsest = max(ROLLUP_RETENTION)
+    start = max(start, now - ROLLUP_RETENTION[coarsest] * coarsest)
+    end = min(end, now)
+    if not (math.isfinite(start) and math.isfinite(end)):
+        raise ValueError("start and end must be finite")
+    return start, end
+
+
+def query_uptime(ip, start, end):
+    """Combine the fewest aligned rollup buckets covering [start, end)"""
+    rollups = ip_rollups.get(ip)
+    if rollups is None:
+        return None
+    granularities = sorted(ROLLUP_RETENTION)
+    now = time.time()
+    start, end = clamp_uptime_window(start, end, now)
+    # Where finer buckets have expired, widen both edges to a coarser boundary
+    for finer, coarser in zip(granularities, granularities[1:]):
+        horizon = now - ROLLUP_RETENTION[finer] * finer
+        if start < horizon:
+            start = int(start // coarser) * coarser
+        if end < horizon:
+            end = -int(-end // coarser) * coarser
+    t = int(start // granularities[0]) * granularities[0]
+    up = down = buckets_used = 0
+    rtt_sum = 0.0
+    rtt_min, rtt_max = math.inf, -math.inf
+    while t < end:
+        for granularity in reversed(granularities):
+            if t % granularity == 0 and (t + granularity <= end or granularity == granularities[0]):
+                break
+        bucket = rollups[granularity].get(t)
+        if bucket is not None:
+            buckets_used += 1
+            up += bucket[0]
+            down += bucket[1]
+            rtt_sum += bucket[2]
+            rtt_min = min(rtt_min, bucket[3])
+            rtt_max = max(rtt_max, bucket[4])
+        t += granularity
+    total = up + down
+    return {
+        'availability': round(up * 100.0 / total, 3) if total else None,
+        'up': up,
+        'down': down,
+        'avg_response_time': round(rtt_sum / up, 2) if up else None,
+        'min_response_time': round(rtt_min, 2) if up else None,
+        'max_response_time': round(rtt_max, 2) if up else None,
+        'buckets': buckets_used
+    }
+
+
+def acquire_probe_token(ip):
+    """Wait for the subnet and global buckets to allow a probe to ip"""
+    import ipaddress
+    subnet_bucket = None
     try:
-        response_time = ping3.ping(ip) * 1000
-        is_online = True if response_time else False
+        addr = ipaddress.ip_address(ip)
+        subnet_bucket = next((bucket for network, bucket in subnet_buckets
+                              if addr.version == network.version and addr in network), None)
+    except ValueError:
+        pass
+    if subnet_bucket and not subnet_bucket.acquire(PROBE_MAX_WAIT):
+        return False
+    if global_bucket and not global_bucket.acquire(PROBE_MAX_WAIT):
+        if subnet_bucket:
+            subnet_bucket.release()
+        return False
+    return True
 
-        current_status = ip_status.get(ip, {})
-        last_online = None
 
-        if current_status.get('online', True) and not is_online:
-            last_online = current_status.get(
-                'last_check', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
-        elif is_online:
-            last_online = None
-        else:
-            last_online = current_status.get('last_online')
+def check_ip(ip):
+    """Fungsi untuk mengecek status IP.
 
-        return {
-            'online': is_online,
-            'response_time': f'{response_time:.2f}' if response_time else 'N/A',
-            'last_check': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'last_online': last_online
-        }
+    Returns None when our own rate limiter dropped the probe, so the
+    caller keeps the previous result instead of reporting a false offline.
+    """
+    if not acquire_probe_token(ip):
+        count_probe('rate_limited')
+        return None
+
+    count_probe('sent')
+    try:
+        response = ping3.ping(ip)
     except Exception:
-        current_status = ip_status.get(ip, {})
-        return {
-            'online': False,
-            'response_time': 'N/A',
-            'last_check': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'last_online': current_status.get('last_online') or current_status.get('last_check')
+        response = False
+    # ping3 returns None on timeout and False on errors such as unknown host
+    if response is None:
+        count_probe('timeouts')
+    elif response is False:
+        count_probe('errors')
+    response_time = response * 1000 if response else None
+    is_online = True if response_time else False
+
+    current_status = ip_status.get(ip, {})
+    now = time.time()
+    last_online_ts = None
+
+    if current_status.get('online', True) and not is_online:
+        last_online_ts = current_status.get('last_check_ts', now)
+    elif is_online:
+        last_online_ts = None
+    else:
+        last_online_ts = current_status.get('last_online_ts')
+
+    record_sample(ip, is_online, response_time)
+    return {
+        'online': is_online,
+        'response_time': f'{response_time:.2f}' if response_time else 'N/A',
+        'last_check': datetime.fromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S'),
+        'last_online': (datetime.fromtimestamp(last_online_ts).strftime('%Y-%m-%d %H:%M:%S')
+                        if last_online_ts else None),
+        # Epochs for the compact /status format
+        'last_check_ts': int(now),
+        'last_online_ts': int(last_online_ts) if last_online_ts else None
+    }
+
+# Profiling is off unless an admin starts a session; every hook below
+# only checks `profile_session is not None` while it is off.
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+# Upper bounds for one session so the hooks can't be left on indefinitely
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "3600"))
+PROFILE_MAX_SWEEPS = int(os.getenv("PROFILE_MAX_SWEEPS", "1000"))
+# From Python 3.12 cProfile runs on sys.monitoring: a single profiler sees every
+# thread and a second one can't be enabled, so cpu mode uses one per session
+PROCESS_WIDE_CPROFILE = sys.version_info >= (3, 12)
+profile_session = None
+profile_reports = {}
+profile_lock = threading.Lock()
+
+
+def start_profiling(mode, memory, sweeps, seconds):
+    """Start a session profiling the next `sweeps` sweeps and/or `seconds` seconds.
+
+    Returns None on success, otherwise a message saying why it didn't start.
+    """
+    global profile_session
+    import cProfile
+    import tracemalloc
+    with profile_lock:
+        if profile_session is not None:
+            return 'Profiling already running'
+        session = {
+            'mode': mode,
+            'memory': memory,
+            'sweeps_left': sweeps,
+            'started': time.time(),
+            'stats': None,
+            'samples': Counter(),
+            'timer': None,
+            'memory_start': None,
+            'process_profiler': None,
         }
+        if mode == 'cpu' and PROCESS_WIDE_CPROFILE:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                return 'Another profiler or debugger is already active'
+            session['process_profiler'] = profiler
+        if memory:
+            tracemalloc.start(25)
+            session['memory_start'] = tracemalloc.take_snapshot()
+        if seconds:
+            session['timer'] = threading.Timer(seconds, finish_profiling, args=(session,))
+            session['timer'].daemon = True
+            session['timer'].start()
+        profile_session = session
+    if mode == 'sampling':
+        threading.Thread(target=sample_stacks, args=(session,), daemon=True).start()
+    return None
+
+
+def sample_stacks(session):
+    """Sampling profiler: count folded stacks of every thread"""
+    import sys
+    own = threading.get_ident()
+    while profile_session is session:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            session['samples'][';'.join(reversed(stack))] += 1
+        time.sleep(PROFILE_SAMPLE_INTERVAL)
+
+
+def begin_profile(session):
+    """Enable a deterministic profiler for the current thread, if the session wants one"""
+    import cProfile
+    if session is None or session['mode'] != 'cpu' or PROCESS_WIDE_CPROFILE:
+        # On 3.12+ the session's process-wide profiler already covers this thread
+        return None
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def end_profile(session, profiler):
+    """Disable profiler and merge its stats into the session"""
+    import pstats
+    if profiler is None:
+        return
+    profiler.disable()
+    with profile_lock:
+        if session['stats'] is None:
+            session['stats'] = pstats.Stats(profiler)
+        else:
+            session['stats'].add(profiler)
+
+
+def end_profiled_sweep(session, profiler):
+    end_profile(session, profiler)
+    if session['sweeps_left']:
+        session['sweeps_left'] -= 1
+        if session['sweeps_left'] == 0:
+            finish_profiling(session)
+
+
+def finish_profiling(session=None):
+    """Stop the session and turn its data into downloadable reports"""
+    global profile_session
+    import pstats
+    import tempfile
+    import tracemalloc
+    with profile_lock:
+        if profile_session is None or (session is not None and profile_session is not session):
+            return False
+        session = profile_session
+        profile_session = None
+        if session['timer'] is not None:
+            session['timer'].cancel()
+        if session['process_profiler'] is not None:
+            session['process_profiler'].disable()
+            session['stats'] = pstats.Stats(session['process_profiler'])
+
+        reports = {}
+        if session['stats'] is not None:
+            with tempfile.NamedTemporaryFile(suffix='.prof') as f:
+                session['stats'].dump_stats(f.name)
+                reports['cpu.prof'] = f.read()
+            text = io.StringIO()
+            session['stats'].stream = text
+            session['stats'].sort_stats('cumulative').print_stats(50)
+            reports['cpu.txt'] = text.getvalue().encode()
+        if session['samples']:
+            reports['cpu.folded'] = ''.join(
+                f"{stack} {count}\n"
+                for stack, count in session['samples'].most_common()).encode()
+        if session['memory']:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            lines = ["Top allocations since profiling started:"]
+            lines += [str(stat) for stat in snapshot.compare_to(session['memory_start'], 'lineno')[:50]]
+            lines += ["", "Top live allocations:"]
+            lines += [str(stat) for stat in snapshot.statistics('lineno')[:50]]
+            reports['memory.txt'] = '\n'.join(lines).encode()
+        profile_reports.clear()
+        profile_reports.update(reports)
+    return True
+
 
 # Update monitor_ips function
 
@@ -700,10 +1266,86 @@ def monitor_ips():
     """Fungsi background untuk monitoring IP"""
     while True:
         # Convert to list to avoid runtime modification issues
-        for ip in list(ip_addresses.keys()):
+        ips = list(ip_addresses.keys())
+        session = profile_session
+        profiler = begin_profile(session) if session is not None else None
+        sweep_start = time.monotonic()
+        # Spread send times evenly across the interval instead of bursting
+        slot = SWEEP_INTERVAL / len(ips) if ips else SWEEP_INTERVAL
+        next_send = sweep_start
+        for ip in ips:
+            delay = next_send - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            if ip not in ip_addresses:
+                # Removed by the admin API or a config reload mid-sweep
+                continue
             status = check_ip(ip)
-            ip_status[ip] = status
-        time.sleep(5)
+            # Re-anchor after a slow probe so overdue hosts don't fire back-to-back
+            next_send = max(next_send + slot, time.monotonic())
+            if status is None:
+                # Dropped by the rate limiter, keep the previous result
+                continue
+            with ip_addresses_lock:
+                # Re-check: the probe can take PROBE_MAX_WAIT plus the ping timeout
+                if ip in ip_addresses:
+                    ip_status[ip] = status
+        if session is not None:
+            end_profiled_sweep(session, profiler)
+        remaining = sweep_start + SWEEP_INTERVAL - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+
+COLUMNAR_MIMETYPE = 'application/vnd.ipmon.columnar+json'
+LEGACY_HIDDEN_KEYS = ('last_check_ts', 'last_online_ts')
+
+
+def columnar_status(client_names_version):
+    """Build /status as parallel arrays in ips order.
+
+    online is 0/1, rtt is a float in ms, last_check and last_online are
+    seconds relative to base and tz_offset is the server's UTC offset, so
+    clients render the same local times as the legacy format. ips and
+    names are only sent when the client's names_version is stale,
+    otherwise the client reuses its copy.
+    """
+    with ip_addresses_lock:
+        version = names_version
+        ips = list(ip_addresses.keys())
+        names = [ip_addresses[ip] for ip in ips] if client_names_version != version else None
+
+    statuses = [ip_status.get(ip) for ip in ips]
+    base = min((s['last_check_ts'] for s in statuses if s), default=int(time.time()))
+
+    online, rtt, last_check, last_online = [], [], [], []
+    for current_status in statuses:
+        if current_status is None:
+            online.append(None)
+            rtt.append(None)
+            last_check.append(None)
+            last_online.append(None)
+            continue
+        online.append(1 if current_status['online'] else 0)
+        rtt.append(float(current_status['response_time'])
+                   if current_status['response_time'] != 'N/A' else None)
+        last_check.append(current_status['last_check_ts'] - base)
+        last_online.append(current_status['last_online_ts'] - base
+                           if current_status['last_online_ts'] else None)
+
+    payload = {
+        'names_version': version,
+        'base': base,
+        'tz_offset': int(datetime.now().astimezone().utcoffset().total_seconds()),
+        'online': online,
+        'rtt': rtt,
+        'last_check': last_check,
+        'last_online': last_online
+    }
+    if names is not None:
+        payload['ips'] = ips
+        payload['names'] = names
+    return payload
 
 
 @app.route('/')
@@ -713,9 +1355,168 @@ def home():
 
 @app.route('/status')
 def status():
+    wants_columnar = (request.args.get('format') == 'columnar' or
+                      request.accept_mimetypes.best == COLUMNAR_MIMETYPE)
+    if wants_columnar:
+        response = jsonify(columnar_status(request.args.get('names_version')))
+        response.headers['Content-Type'] = COLUMNAR_MIMETYPE
+    else:
+        # Epochs are only for the compact format, keep the legacy payload as it was
+        response = jsonify({
+            'status': {ip: {key: value for key, value in current_status.items()
+                            if key not in LEGACY_HIDDEN_KEYS}
+                       for ip, current_status in list(ip_status.items())},
+            'names': ip_addresses
+        })
+    response.headers['Vary'] = 'Accept'
+    return response
+
+
+@app.route('/probe-stats')
+def get_probe_stats():
+    with probe_stats_lock:
+        return jsonify(dict(probe_stats))
+
+
+def parse_time_arg(value):
+    """Parse an epoch or ISO 8601 query value into epoch seconds"""
+    if not value:
+        return None
+    try:
+        ts = float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+    if not math.isfinite(ts):
+        raise ValueError(f"time must be finite: {value}")
+    return ts
+
+
+def export_rows(kind, hosts, start, end):
+    """Yield export rows one host at a time so memory stays flat"""
+    for ip in hosts:
+        if kind == 'history':
+            # list() copies the deque atomically, the probe loop keeps appending
+            for ts, online, rtt in list(ip_history.get(ip, ())):
+                if (start is not None and ts < start) or (end is not None and ts > end):
+                    continue
+                yield {
+                    'ip': ip,
+                    'name': ip_addresses.get(ip),
+                    'timestamp': datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S'),
+                    'online': online,
+                    'response_time': round(rtt, 2) if rtt is not None else None
+                }
+        else:
+            current_status = ip_status.get(ip)
+            if current_status is None:
+                continue
+            yield {
+                'ip': ip,
+                'name': ip_addresses.get(ip),
+                'online': current_status['online'],
+                'response_time': current_status['response_time'],
+                'last_check': current_status['last_check'],
+                'last_online': current_status['last_online']
+            }
+
+
+def encode_csv(rows, fields):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def encode_ndjson(rows):
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(row))
+        if len(chunk) >= 500:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
+
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@app.route('/export')
+def export():
+    kind = request.args.get('data', 'status')
+    fmt = request.args.get('format', 'csv')
+    if kind not in ('status', 'history') or fmt not in ('csv', 'ndjson'):
+        return jsonify({'success': False, 'message': 'Invalid data or format'}), 400
+
+    if kind == 'status' and (request.args.get('start') or request.args.get('end')):
+        return jsonify({'success': False, 'message': 'start and end only apply to history'}), 400
+    try:
+        start = parse_time_arg(request.args.get('start'))
+        end = parse_time_arg(request.args.get('end'))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid start or end time'}), 400
+    if start is not None and end is not None and start > end:
+        return jsonify({'success': False, 'message': 'start must not be after end'}), 400
+
+    hosts = request.args.get('hosts')
+    if hosts:
+        hosts = [ip.strip() for ip in hosts.split(',') if ip.strip()]
+    else:
+        hosts = list(ip_addresses.keys())
+
+    rows = export_rows(kind, hosts, start, end)
+    if fmt == 'csv':
+        if kind == 'history':
+            fields = ['ip', 'name', 'timestamp', 'online', 'response_time']
+        else:
+            fields = ['ip', 'name', 'online', 'response_time', 'last_check', 'last_online']
+        body = encode_csv(rows, fields)
+        mimetype = 'text/csv'
+    else:
+        body = encode_ndjson(rows)
+        mimetype = 'application/x-ndjson'
+
+    headers = {'Content-Disposition': f'attachment; filename={kind}.{fmt}'}
+    if request.args.get('gzip') in ('1', 'true'):
+        body = gzip_stream(body)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(body, mimetype=mimetype, headers=headers)
+
+
+@app.route('/uptime')
+def uptime():
+    try:
+        days = float(request.args.get('days', '30'))
+        end = parse_time_arg(request.args.get('end')) or time.time()
+        start = parse_time_arg(request.args.get('start')) or end - days * 86400
+    except (ValueError, OverflowError):
+        return jsonify({'success': False, 'message': 'Invalid time range'}), 400
+    if not all(math.isfinite(v) for v in (days, start, end)) or days < 0 or start > end:
+        return jsonify({'success': False, 'message': 'Invalid time range'}), 400
+
+    # Clamp to what the rollups can answer so the bucket walk stays short
+    start, end = clamp_uptime_window(start, end, time.time())
+    if start > end:
+        return jsonify({'success': False, 'message': 'Time range is outside retained rollups'}), 400
+
+    ip = request.args.get('ip')
+    hosts = [ip] if ip else list(ip_addresses.keys())
     return jsonify({
-        'status': ip_status,
-        'names': ip_addresses
+        'start': datetime.fromtimestamp(start).strftime('%Y-%m-%d %H:%M:%S'),
+        'end': datetime.fromtimestamp(end).strftime('%Y-%m-%d %H:%M:%S'),
+        'uptime': {host: query_uptime(host, start, end) for host in hosts}
     })
 
 
@@ -743,8 +1544,10 @@ def add_ip():
     if ip in ip_addresses:
         return jsonify({'success': False, 'message': 'IP already exists'})
 
-    ip_addresses[ip] = name
-    save_ip_addresses(ip_addresses)
+    with ip_addresses_lock:
+        ip_addresses[ip] = name
+        bump_names_version()
+        save_ip_addresses(ip_addresses)
     return jsonify({'success': True})
 
 
@@ -763,14 +1566,101 @@ def remove_ip():
     if ip not in ip_addresses:
         return jsonify({'success': False, 'message': 'IP not found'})
 
-    del ip_addresses[ip]
-    if ip in ip_status:
-        del ip_status[ip]
-    save_ip_addresses(ip_addresses)
+    with ip_addresses_lock:
+        ip_addresses.pop(ip, None)
+        forget_ip(ip)
+        bump_names_version()
+        save_ip_addresses(ip_addresses)
+    return jsonify({'success': True})
+
+
+def is_admin(password):
+    return bool(password) and hashlib.sha256(password.encode()).hexdigest() == PASSWORD_HASH
+
+
+@app.before_request
+def profile_request_start():
+    if profile_session is not None:
+        g.profile_session = profile_session
+        g.profiler = begin_profile(profile_session)
+
+
+@app.teardown_request
+def profile_request_end(exc):
+    # Checked via g so a session ending mid-request still disables the profiler
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        end_profile(g.profile_session, profiler)
+
+
+@app.route('/profile/start', methods=['POST'])
+def profile_start():
+    data = request.get_json()
+    if not is_admin(data.get('password')):
+        return jsonify({'success': False, 'message': 'Invalid password'})
+
+    mode = data.get('mode', 'cpu')
+    if mode not in ('cpu', 'sampling', 'none'):
+        return jsonify({'success': False, 'message': 'Mode must be cpu, sampling or none'})
+    try:
+        sweeps = int(data.get('sweeps') or 0)
+        seconds = float(data.get('seconds') or 0)
+    except (TypeError, ValueError, OverflowError):
+        return jsonify({'success': False, 'message': 'Invalid sweeps or seconds'})
+    if not (0 <= sweeps <= PROFILE_MAX_SWEEPS and math.isfinite(seconds)
+            and 0 <= seconds <= PROFILE_MAX_SECONDS):
+        return jsonify({'success': False, 'message':
+                        f'Sweeps must be 0-{PROFILE_MAX_SWEEPS} and seconds 0-{PROFILE_MAX_SECONDS:g}'})
+    if sweeps == 0 and seconds == 0:
+        return jsonify({'success': False, 'message': 'Sweeps or seconds required'})
+    if mode == 'none' and not data.get('memory'):
+        return jsonify({'success': False, 'message': 'Mode none requires memory tracking'})
+
+    error = start_profiling(mode, bool(data.get('memory')), sweeps, seconds)
+    if error:
+        return jsonify({'success': False, 'message': error})
     return jsonify({'success': True})
 
 
+@app.route('/profile/stop', methods=['POST'])
+def profile_stop():
+    data = request.get_json()
+    if not is_admin(data.get('password')):
+        return jsonify({'success': False, 'message': 'Invalid password'})
+    if not finish_profiling():
+        return jsonify({'success': False, 'message': 'Profiling not running'})
+    return jsonify({'success': True, 'reports': sorted(profile_reports)})
+
+
+@app.route('/profile/status')
+def profile_status():
+    if not is_admin(request.headers.get('X-Admin-Password')):
+        return jsonify({'success': False, 'message': 'Invalid password'})
+    session = profile_session
+    return jsonify({
+        'success': True,
+        'running': session is not None,
+        'mode': session['mode'] if session else None,
+        'sweeps_left': session['sweeps_left'] if session else None,
+        'reports': sorted(profile_reports)
+    })
+
+
+@app.route('/profile/report/<name>')
+def profile_report(name):
+    if not is_admin(request.headers.get('X-Admin-Password')):
+        return jsonify({'success': False, 'message': 'Invalid password'})
+    report = profile_reports.get(name)
+    if report is None:
+        return jsonify({'success': False, 'message': 'Report not found'}), 404
+    mimetype = 'application/octet-stream' if name.endswith('.prof') else 'text/plain'
+    return Response(report, mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={name}'})
+
+
 if __name__ == '__main__':
     monitor_thread = threading.Thread(target=monitor_ips, daemon=True)
     monitor_thread.start()
+    watch_thread = threading.Thread(target=watch_ip_file, daemon=True)
+    watch_thread.start()
     app.run(debug=True, host='0.0.0.0', port=5000)
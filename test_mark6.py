@@ -0,0 +1,230 @@
+import json
+import time
+
+import pytest
+
+import mark6
+
+IP = '192.0.2.1'
+DAY = 86400
+
+
+@pytest.fixture(scope='module')
+def samples():
+    """One sample per minute for 40 days, every 10th one down"""
+    mark6.ip_rollups.pop(IP, None)
+    now = time.time()
+    timestamps = []
+    t = now - 40 * DAY
+    i = 0
+    while t < now:
+        mark6.update_rollups(IP, t, i % 10 != 0, 5.0 + i % 3)
+        timestamps.append(t)
+        t += 60
+        i += 1
+    yield timestamps
+    mark6.ip_rollups.pop(IP, None)
+
+
+def expected_count(timestamps, start, end):
+    return sum(1 for t in timestamps if start <= t < end)
+
+
+def test_uptime_30_days(samples):
+    now = time.time()
+    result = mark6.query_uptime(IP, now - 30 * DAY, now)
+    total = result['up'] + result['down']
+    expected = expected_count(samples, now - 30 * DAY, now)
+    # The start is widened to the hour because its minute buckets expired
+    assert expected <= total <= expected + 60
+    assert result['availability'] == pytest.approx(90, abs=0.1)
+    assert result['min_response_time'] == 5.0
+    assert result['max_response_time'] == 7.0
+    assert result['buckets'] < 200
+
+
+def test_uptime_1_day(samples):
+    now = time.time()
+    result = mark6.query_uptime(IP, now - DAY, now)
+    total = result['up'] + result['down']
+    expected = expected_count(samples, now - DAY, now)
+    # Start widened to the hour, recent end read from minute buckets
+    assert expected <= total <= expected + 60
+    assert result['buckets'] < 200
+
+
+def test_uptime_recent_window_is_exact(samples):
+    now = time.time()
+    result = mark6.query_uptime(IP, now - 2 * 3600, now)
+    # Minute granularity at both edges: off by at most the partial first minute
+    assert abs(result['up'] + result['down'] - expected_count(samples, now - 2 * 3600, now)) <= 1
+
+
+def test_uptime_old_window_uses_coarse_edges(samples):
+    now = time.time()
+    # Hour-aligned start, end half way through an hour whose minutes expired
+    start = (now - 10 * DAY) // 3600 * 3600
+    end = (now - 5 * DAY) // 3600 * 3600 + 1800
+    result = mark6.query_uptime(IP, start, end)
+    total = result['up'] + result['down']
+    expected = expected_count(samples, start, end)
+    # The end is widened to the whole hour, never narrowed
+    assert expected <= total <= expected + 60
+
+
+def test_uptime_clamps_unbounded_window(samples):
+    now = time.time()
+    result = mark6.query_uptime(IP, float('-inf'), float('inf'))
+    assert result['up'] + result['down'] == len(samples)
+    with pytest.raises(ValueError):
+        mark6.query_uptime(IP, float('nan'), now)
+
+
+@pytest.mark.parametrize('query', ['days=nan', 'days=inf', 'days=-1', 'start=1e400',
+                                   'end=1e20', 'start=1e12&end=2e12', 'start=1&end=2'])
+def test_uptime_route_rejects_bad_ranges(query):
+    response = mark6.app.test_client().get(f'/uptime?ip={IP}&{query}')
+    assert response.status_code == 400
+
+
+def test_uptime_route_clamps_huge_window(samples):
+    response = mark6.app.test_client().get(f'/uptime?ip={IP}&days=1e12')
+    assert response.status_code == 200
+    assert response.get_json()['uptime'][IP]['up'] > 0
+
+
+def test_token_bucket_acquire_and_release():
+    bucket = mark6.TokenBucket(1, burst=2)
+    assert bucket.acquire(0)
+    assert bucket.acquire(0)
+    assert not bucket.acquire(0)
+    bucket.release()
+    assert bucket.acquire(0)
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = mark6.TokenBucket(20, burst=1)
+    assert bucket.acquire(0)
+    started = time.monotonic()
+    assert bucket.acquire(1)
+    assert time.monotonic() - started >= 0.04
+
+
+def test_probe_token_returns_subnet_token_when_global_drops(monkeypatch):
+    subnets = mark6.parse_subnet_limits('10.0.0.0/8=5,10.1.0.0/16=1')
+    global_bucket = mark6.TokenBucket(1, burst=1)
+    global_bucket.acquire(0)
+    monkeypatch.setattr(mark6, 'subnet_buckets', subnets)
+    monkeypatch.setattr(mark6, 'global_bucket', global_bucket)
+    monkeypatch.setattr(mark6, 'PROBE_MAX_WAIT', 0)
+
+    # Most specific subnet first
+    assert subnets[0][0].prefixlen == 16
+    assert not mark6.acquire_probe_token('10.1.2.3')
+    assert subnets[0][1].tokens >= 1
+
+    global_bucket.release()
+    assert mark6.acquire_probe_token('10.1.2.3')
+    assert not subnets[0][1].acquire(0)
+
+
+@pytest.mark.parametrize('query', ['start=nan', 'end=inf', 'start=-inf', 'start=20&end=10'])
+def test_export_rejects_bad_ranges(query):
+    response = mark6.app.test_client().get(f'/export?data=history&{query}')
+    assert response.status_code == 400
+
+
+def test_export_history_time_filter(monkeypatch):
+    monkeypatch.setitem(mark6.ip_addresses, IP, 'Test')
+    monkeypatch.setitem(mark6.ip_history, IP, [(100.0, True, 1.0), (200.0, False, None)])
+    response = mark6.app.test_client().get(
+        f'/export?data=history&format=ndjson&hosts={IP}&start=150&end=250')
+    assert response.status_code == 200
+    lines = response.data.decode().splitlines()
+    assert len(lines) == 1
+    assert '"online": false' in lines[0]
+
+
+@pytest.fixture
+def monitor_state(monkeypatch, tmp_path):
+    ip_file = tmp_path / 'monitored_ips.json'
+    monkeypatch.setattr(mark6, 'IP_FILE', str(ip_file))
+    for name in ('ip_addresses', 'ip_status', 'ip_history', 'ip_rollups'):
+        monkeypatch.setattr(mark6, name, {})
+    return ip_file
+
+
+def test_reload_applies_only_the_diff(monitor_state):
+    mark6.ip_addresses.update({'10.0.0.1': 'kept', '10.0.0.2': 'old name', '10.0.0.3': 'gone'})
+    for ip in mark6.ip_addresses:
+        mark6.ip_status[ip] = {'online': True}
+        mark6.record_sample(ip, True, 5.0)
+    version = mark6.names_version
+
+    monitor_state.write_text(json.dumps({
+        '10.0.0.1': 'kept', '10.0.0.2': 'new name', '10.0.0.4': 'new', 'not-an-ip': 'bad'}))
+    added, removed, renamed = mark6.reload_ip_file()
+
+    assert added == {'10.0.0.4': 'new'}
+    assert removed == ['10.0.0.3']
+    assert renamed == {'10.0.0.2': 'new name'}
+    assert mark6.ip_addresses == {'10.0.0.1': 'kept', '10.0.0.2': 'new name', '10.0.0.4': 'new'}
+    assert mark6.names_version != version
+    # Unchanged and renamed hosts keep their state, removed hosts are forgotten
+    for ip in ('10.0.0.1', '10.0.0.2'):
+        assert ip in mark6.ip_status
+        assert len(mark6.ip_history[ip]) == 1
+        assert ip in mark6.ip_rollups
+    for state in (mark6.ip_status, mark6.ip_history, mark6.ip_rollups):
+        assert '10.0.0.3' not in state
+
+
+def test_reload_without_changes_keeps_names_version(monitor_state):
+    mark6.ip_addresses['10.0.0.1'] = 'kept'
+    version = mark6.names_version
+    monitor_state.write_text(json.dumps({'10.0.0.1': 'kept'}))
+    assert mark6.reload_ip_file() == ({}, [], {})
+    assert mark6.names_version == version
+
+
+def test_legacy_status_hides_epochs(monitor_state, monkeypatch):
+    monkeypatch.setattr(mark6, 'acquire_probe_token', lambda ip: True)
+    monkeypatch.setattr(mark6.ping3, 'ping', lambda ip: 0.01)
+    mark6.ip_addresses['10.0.0.1'] = 'host'
+    mark6.ip_status['10.0.0.1'] = mark6.check_ip('10.0.0.1')
+
+    client = mark6.app.test_client()
+    legacy = client.get('/status').get_json()['status']['10.0.0.1']
+    assert set(legacy) == {'online', 'response_time', 'last_check', 'last_online'}
+    compact = client.get('/status?format=columnar').get_json()
+    assert compact['online'] == [1]
+    assert compact['last_check'] == [0]
+
+
+@pytest.mark.parametrize('body', [
+    {'seconds': 1e300},
+    {'seconds': 'nan'},
+    {'seconds': 'inf'},
+    {'seconds': -5},
+    {'sweeps': -1},
+    {'sweeps': 10 ** 9},
+    {},
+    {'mode': 'none', 'sweeps': 1},
+    {'mode': 'bogus', 'sweeps': 1},
+])
+def test_profile_start_rejects_bad_sessions(body):
+    response = mark6.app.test_client().post(
+        '/profile/start', json={'password': mark6.ADMIN_PASSWORD, **body})
+    assert response.get_json()['success'] is False
+    assert mark6.profile_session is None
+
+
+def test_profile_session_produces_reports():
+    client = mark6.app.test_client()
+    response = client.post('/profile/start', json={
+        'password': mark6.ADMIN_PASSWORD, 'mode': 'cpu', 'memory': True, 'seconds': 60})
+    assert response.get_json()['success'] is True
+    client.get('/list-ips')
+    response = client.post('/profile/stop', json={'password': mark6.ADMIN_PASSWORD})
+    assert mark6.profile_session is None
+    assert {'cpu.prof', 'cpu.txt', 'memory.txt'} <= set(response.get_json()['reports'])